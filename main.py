@@ -1,13 +1,16 @@
 import os
+import string
 import asyncio
 import time
 import logging
+import functools
+from collections import OrderedDict, defaultdict
 from datetime import datetime
+from itertools import chain, islice
 import traceback
-import re
 import gspread
 from twitchio.ext import commands
-from thefuzz import process, fuzz
+from rapidfuzz import process, fuzz
 from dotenv import load_dotenv
 
 # --- LOGGING CONFIGURATION ---
@@ -36,15 +39,40 @@ WORKBOOK_NAME = os.getenv('WORKBOOK_NAME')
 JSON_KEYFILE = 'service_account.json'
 CACHE_REFRESH_HOURS = 1
 VILLAGERS_DIR = os.getenv('VILLAGERS_DIR')
+# Villagers.txt separates names with commas and/or newlines
+VILLAGER_SEPARATORS = str.maketrans(",\r", "\n\n")
+# Below this many bucketed candidates, fuzzy search falls back to every key
+FUZZY_MIN_CANDIDATES = 50
+# Most recent users whose command cooldowns are remembered
+COOLDOWN_MAX_USERS = 10000
+# Punctuation is a word break for fuzzy matching, so "jack in the box" matches "jack-in-the-box"
+PUNCT_TO_SPACE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def _sort_tokens(text):
+    """Returns the unique tokens of text, split on whitespace and punctuation, sorted and space-joined."""
+    return " ".join(sorted(set(text.translate(PUNCT_TO_SPACE).split())))
+
+
+def _index_sheet(rows):
+    """Returns the casefolded item names found below a sheet's header row."""
+    keys = {cell.strip().casefold() for cell in chain.from_iterable(islice(rows, 1, None))}
+    keys.discard("")
+    return keys
 
 
 class TreasureBot(commands.Bot):
     def __init__(self):
         super().__init__(token=TOKEN, prefix='!', initial_channels=[CHANNEL])
         self.cache = {}
+        self.villager_cache = {}
+        self.display = {}
+        self._key_sorted = {}
+        self._by_first = {}
+        self._cache_version = 0
         self.last_update = None
         self.gc = None
-        self.cooldowns = {}
+        self.cooldowns = OrderedDict()
         self._refresh_task = None
 
         try:
@@ -69,8 +97,9 @@ class TreasureBot(commands.Bot):
 
         # --- CHAT LOGGING ---
         try:
-            author = message.author.name if message.author else "Unknown"
-            logger.info(f"[CHAT] {author}: {message.content}")
+            if logger.isEnabledFor(logging.INFO):
+                author = message.author.name if message.author else "Unknown"
+                logger.info("[CHAT] %s: %s", author, message.content)
         except Exception as e:
             logger.error(f"Failed to log message: {e}")
         # --------------------
@@ -80,14 +109,20 @@ class TreasureBot(commands.Bot):
     async def update_cache(self):
         logger.info("Updating cache from Google Sheets...")
         try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, self._sync_update)
-            logger.info(f"Cache updated: {len(self.cache)} items loaded.")
+            # Disk scan and sheet fetch are independent blocking I/O; overlap them
+            # on worker threads instead of running them back to back.
+            villagers, _ = await asyncio.gather(
+                asyncio.to_thread(self._sync_villagers),
+                asyncio.to_thread(self._sync_items)
+            )
+            self.villager_cache = villagers
+            await asyncio.to_thread(self._build_search_index)
+            logger.info(f"Cache updated: {len(self.cache)} items, {len(self.villager_cache)} villagers loaded.")
         except Exception as e:
             logger.error(f"Sheet Update Failed: {e}", exc_info=True)
 
-    def _sync_update(self):
-        """Fetches ITEMS from Google Sheets only. Villagers are fetched live."""
+    def _sync_items(self):
+        """Fetches ITEMS from Google Sheets."""
         if not self.gc:
             try:
                 self.gc = gspread.service_account(filename=JSON_KEYFILE)
@@ -103,42 +138,54 @@ class TreasureBot(commands.Bot):
 
             logger.info(f"Found {len(worksheets)} sheets. Scanning...")
 
-            for sheet in worksheets:
-                if sheet.title == "ACNH_Items":
-                    continue
-
-                try:
-                    rows = sheet.get_all_values()
-                    if not rows: continue
-
-                    location_name = sheet.title
+            titles = [sheet.title for sheet in worksheets if sheet.title != "ACNH_Items"]
+            # One values.batchGet request for every sheet instead of a round-trip (and a
+            # quota sleep) per sheet. valueRanges come back in the order requested.
+            response = wb.values_batch_get(
+                ranges=[gspread.utils.absolute_range_name(title) for title in titles]
+            )
 
-                    for row in rows[1:]:
-                        for cell in row:
-                            item_name = cell.strip()
-                            if item_name:
-                                key = item_name.lower()
-                                if key in temp_cache:
-                                    current_locations = temp_cache[key].split(", ")
-                                    if location_name not in current_locations:
-                                        temp_cache[key] += f", {location_name}"
-                                else:
-                                    temp_cache[key] = location_name
+            for location_name, value_range in zip(titles, response.get("valueRanges", [])):
+                rows = value_range.get("values", [])
+                if not rows: continue
 
-                    sheets_scanned += 1
-                    logger.info(f"Indexed: {location_name}")
-                    time.sleep(1.0)
+                for key in _index_sheet(rows):
+                    temp_cache.setdefault(key, set()).add(location_name)
 
-                except Exception as e:
-                    logger.error(f"Error reading '{sheet.title}': {e}")
+                sheets_scanned += 1
+                logger.info("Indexed: %s", location_name)
 
-            self.cache = temp_cache
+            self.cache = {k: sorted(v) for k, v in temp_cache.items()}
             self.last_update = datetime.now()
             logger.info(f"Scan complete. {sheets_scanned} sheets processed.")
 
         except Exception as e:
             logger.error(f"Workbook fetch failed: {e}")
 
+    def _build_search_index(self):
+        """Precomputes the exact-match replies and fuzzy-match choices for items and villagers."""
+        key_sorted = {k: _sort_tokens(k) for k in (*self.cache, *self.villager_cache)}
+
+        # Render each key's "<map word>: A | B" text once here instead of per !find
+        display = {}
+        for key in key_sorted:
+            # Each list is already deduplicated; only the merge can repeat a map.
+            locations = list(dict.fromkeys(self.cache.get(key, []) + self.villager_cache.get(key, [])))
+            map_word = "this map" if len(locations) == 1 else "these maps"
+            display[key] = f"{map_word}: {' | '.join(locations).upper()}"
+
+        # Bucket keys by the first letter of each of their tokens, so a query only
+        # gets scored against keys sharing a token initial with it.
+        by_first = defaultdict(dict)
+        for key, sorted_key in key_sorted.items():
+            for token in sorted_key.split():
+                by_first[token[0]][key] = sorted_key
+
+        self.display = display
+        self._key_sorted = key_sorted
+        self._by_first = by_first
+        self._cache_version += 1
+
     async def auto_refresh_cache(self):
         try:
             while True:
@@ -150,14 +197,18 @@ class TreasureBot(commands.Bot):
             logger.error(f"Auto-refresh failed: {e}")
 
     def check_cooldown(self, user_id: str, cooldown_sec: int = 3) -> bool:
-        now = time.time()
-        if user_id in self.cooldowns:
-            if now - self.cooldowns[user_id] < cooldown_sec:
-                return True
+        now = time.monotonic()
+        ts = self.cooldowns.pop(user_id, None)
+        if ts is not None and now - ts < cooldown_sec:
+            self.cooldowns[user_id] = ts  # reinsert at tail
+            return True
         self.cooldowns[user_id] = now
+        if len(self.cooldowns) > COOLDOWN_MAX_USERS:
+            self.cooldowns.popitem(last=False)
         return False
 
-    def get_villagers(self):
+    def _sync_villagers(self):
+        """Scans VILLAGERS_DIR for Villagers.txt files."""
         data = {}
         villagers_root = VILLAGERS_DIR
 
@@ -173,27 +224,46 @@ class TreasureBot(commands.Bot):
                     with open(file_path, 'rb') as file:
                         raw_content = file.read().decode('utf-8', errors='ignore')
 
-                        names_list = re.split(r'[,\n\r]+', raw_content)
+                        names_list = raw_content.translate(VILLAGER_SEPARATORS).split("\n")
 
                         for name in names_list:
                             clean_name = name.strip()
 
                             if clean_name:
-                                key = clean_name.lower()
+                                key = clean_name.casefold()
 
                                 if len(key) > 30: continue
 
-                                if key in data:
-                                    current_locs = data[key].split(", ")
-                                    if location_name not in current_locs:
-                                        data[key] += f", {location_name}"
-                                else:
-                                    data[key] = location_name
-            return data
+                                data.setdefault(key, set()).add(location_name)
 
         except Exception as e:
             logger.error(f"Villager scan failed: {e}")
-            return data
+
+        return {k: sorted(v) for k, v in data.items()}
+
+    @functools.lru_cache(maxsize=1024)
+    def _fuzzy_lookup(self, term, cache_version):
+        """Returns fuzzy suggestions for term. Memoized per cache version."""
+        query = _sort_tokens(term)
+
+        candidates = {}
+        for token in query.split():
+            candidates.update(self._by_first.get(token[0], {}))
+        if len(candidates) < FUZZY_MIN_CANDIDATES:
+            candidates = self._key_sorted
+
+        # token_set_ratio only looks at the token sets, so matching against
+        # the pre-sorted forms gives the same scores with less work per key.
+        matches = process.extract(
+            query,
+            candidates,
+            limit=5,
+            scorer=fuzz.token_set_ratio,
+            processor=None,
+            score_cutoff=75
+        )
+
+        return tuple(key for _, _, key in matches)
 
     @commands.command(aliases=['locate', 'where', 'villager'])
     async def find(self, ctx: commands.Context, *, item: str = ""):
@@ -204,7 +274,7 @@ class TreasureBot(commands.Bot):
         if self.check_cooldown(str(ctx.author.id)):
             return
 
-        search_term = item.lower().strip()
+        search_term = item.casefold().strip()
         if search_term.startswith("villager "):
             search_term = search_term.replace("villager ", "", 1).strip()
 
@@ -212,52 +282,24 @@ class TreasureBot(commands.Bot):
             await ctx.send(f"Please specify a name: !find villager <name>")
             return
 
-        item_hits = self.cache.get(search_term, "")
-
-        villager_map = self.get_villagers()
-        villager_hits = villager_map.get(search_term, "")
-
-        found_locations = []
-        if item_hits:
-            found_locations.append(item_hits)
-        if villager_hits:
-            found_locations.append(villager_hits)
-
-        if found_locations:
-            all_locations = ", ".join(found_locations)
-            unique_locations = list(set(all_locations.split(", ")))
-            formatted = " | ".join(unique_locations).upper()
-
-            map_word = "this map" if len(unique_locations) == 1 else "these maps"
+        locations = self.display.get(search_term)
 
-            await ctx.send(f"Hey @{ctx.author.name}, I found {search_term.upper()} on {map_word}: {formatted}")
-            logger.info(f"Hey @{ctx.author.name}, I found {search_term.upper()} on {map_word}: {formatted}")
+        if locations:
+            reply = f"Hey @{ctx.author.name}, I found {search_term.upper()} on {locations}"
+            await ctx.send(reply)
+            logger.info(reply)
             return
 
-        all_keys = list(self.cache.keys()) + list(villager_map.keys())
-
-        matches = process.extract(
-            search_term,
-            all_keys,
-            limit=5,
-            scorer=fuzz.token_set_ratio
-        )
-
-        valid_suggestions = list(set([m[0] for m in matches if m[1] > 75]))
+        valid_suggestions = self._fuzzy_lookup(search_term, self._cache_version)
 
         if valid_suggestions:
             suggestions_str = ", ".join(valid_suggestions)
-            await ctx.send(
-                f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" - Did you mean: {suggestions_str}?"
-            )
-            logger.info(
-                f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" - Did you mean: {suggestions_str}?"
-            )
+            reply = f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" - Did you mean: {suggestions_str}?"
         else:
-            await ctx.send(
-                f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" or anything similar. Please check your spelling.")
-            logger.info(
-                f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" or anything similar. Please check your spelling.")
+            reply = f"Hey @{ctx.author.name}, I couldn't find \"{search_term}\" or anything similar. Please check your spelling."
+
+        await ctx.send(reply)
+        logger.info(reply)
 
 
     @commands.command()
@@ -275,10 +317,14 @@ class TreasureBot(commands.Bot):
 
 if __name__ == "__main__":
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # The policy has to be in place before the loop is created
         if os.name == 'nt':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        else:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
 
         logger.info("Bot starting...")
         bot = TreasureBot()
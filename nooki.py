@@ -1,9 +1,16 @@
+import os
+import httpx
+import orjson
 import requests
+import requests_cache
 import urllib.parse
 
 
 class NookipediaClient:
     BASE_URL = "https://api.nookipedia.com"
+    API_VERSION = "1.7.0"
+    CACHE_NAME = "nooki_cache"
+    CACHE_EXPIRE_AFTER = 86400  # Seconds. Nookipedia data is close to static.
 
     def __init__(self, api_key):
         """
@@ -11,8 +18,12 @@ class NookipediaClient:
         """
         self.headers = {
             "X-API-KEY": api_key,
-            "Accept-Version": "1.7.0"
+            "Accept-Version": self.API_VERSION
         }
+        # Reuses connections and serves repeat GETs from an on-disk cache. Expired
+        # entries are revalidated with If-None-Match, so unchanged data costs a 304.
+        self._session = requests_cache.CachedSession(self.CACHE_NAME, expire_after=self.CACHE_EXPIRE_AFTER)
+        self._session.headers.update(self.headers)
 
     def _request(self, endpoint, params=None):
         """
@@ -25,9 +36,9 @@ class NookipediaClient:
         url = f"{self.BASE_URL}{endpoint}"
 
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self._session.get(url, params=params)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except requests.exceptions.HTTPError as e:
             # Return error dict rather than crashing, for easier handling in Flask
             return {"error": str(e), "status_code": response.status_code}
@@ -286,18 +297,50 @@ class NookipediaClient:
             "thumbsize": thumbsize
         })
 
-client = NookipediaClient()
-recipes = client.get_recipes()
 
-unique_materials = set()
+class AsyncNookipediaClient(NookipediaClient):
+    """
+    Async variant of the client. Every endpoint method returns a coroutine,
+    so independent lookups can run concurrently via asyncio.gather().
+    """
+
+    def __init__(self, api_key):
+        # The base __init__ is skipped on purpose: its cached requests session
+        # (and the sqlite file behind it) is never used by the async client.
+        self.headers = {
+            "X-API-KEY": api_key,
+            "Accept-Version": self.API_VERSION
+        }
+        self._client = httpx.AsyncClient(base_url=self.BASE_URL, headers=self.headers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _request(self, endpoint, params=None):
+        """
+        Internal helper to handle requests and error checking.
+        """
+        if params:
+            # Remove None values to avoid sending empty query params
+            params = {k: v for k, v in params.items() if v is not None}
+
+        try:
+            response = await self._client.get(endpoint, params=params)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except httpx.HTTPStatusError as e:
+            return {"error": str(e), "status_code": response.status_code}
 
-for recipe in recipes:
-    for material in recipe['materials']:
-        unique_materials.add(material['name'])
 
-# Convert to a sorted list if you want
-unique_materials = sorted(unique_materials)
+if __name__ == "__main__":
+    client = NookipediaClient(os.environ["NOOKIPEDIA_KEY"])
+    recipes = client.get_recipes()
 
-# Print
-for material in unique_materials:
-    print(material)
\ No newline at end of file
+    unique_materials = sorted({m['name'] for r in recipes for m in r['materials']})
+    print(*unique_materials, sep='\n')
@@ -1,23 +1,46 @@
 import os
+import atexit
+import pickle
+import queue
+import string
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import asyncio
-from datetime import datetime
+import functools
+import concurrent.futures
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain, islice
 import traceback
 
 import discord
-from discord.ext import commands, tasks
+import numpy as np
+from discord.ext import commands
 import gspread
-from thefuzz import process, fuzz
+import orjson
+from gspread.http_client import HTTPClient
+from gspread.urls import SPREADSHEET_VALUES_URL
+from gspread.utils import quote
+from rapidfuzz import process, fuzz
 from dotenv import load_dotenv
 
 # --- LOGGING CONFIGURATION ---
+# Records are formatted by the QueueHandler and written out on the listener's
+# thread, so logging never blocks the event loop on disk or console I/O.
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(
+    log_queue,
+    RotatingFileHandler("discord_bot.log", maxBytes=10_000_000, backupCount=5, encoding='utf-8'),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
-    handlers=[
-        logging.FileHandler("discord_bot.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
 logger = logging.getLogger("TreasureBot")
 
@@ -35,6 +58,39 @@ TOKEN = os.getenv('DISCORD_TOKEN')
 WORKBOOK_NAME = os.getenv('WORKBOOK_NAME')
 JSON_KEYFILE = 'service_account.json'
 CACHE_REFRESH_HOURS = 1
+# Minimum wait before retrying after a refresh attempt, so a failing refresh isn't retried on every !find
+REFRESH_RETRY_MINUTES = 5
+CACHE_FILE = 'cache.pkl'
+# Worksheets that are not item locations and never get indexed
+SKIP_SHEETS = frozenset({"ACNH_Items"})
+# Below this many token-index candidates, fuzzy search scores every key
+MIN_FUZZY_CANDIDATES = 5
+# Worker threads used to download sheets in parallel
+SHEET_FETCH_WORKERS = 8
+# Longer queries can't name a real item and only make fuzzy scoring expensive
+MAX_QUERY_LENGTH = 64
+
+# Punctuation becomes a word break, so "Jack-in-the-box" matches "jack in the box"
+_PUNCT_TBL = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+class OrjsonHTTPClient(HTTPClient):
+    """gspread HTTP client that decodes sheet values with orjson instead of the stdlib json."""
+
+    def values_get(self, id, range, params=None):
+        url = SPREADSHEET_VALUES_URL % (id, quote(range))
+        response = self.request("get", url, params=params)
+        return orjson.loads(response.content)
+
+
+def _norm(text):
+    """Canonical lookup form: punctuation turned into spaces, casefolded, whitespace collapsed."""
+    return " ".join(text.translate(_PUNCT_TBL).casefold().split())
+
+
+def _prep(text):
+    """Sorts the unique tokens of _norm()-ed text for fuzzy matching."""
+    return " ".join(sorted(set(text.split())))
 
 
 class TreasureBot(commands.Bot):
@@ -50,20 +106,34 @@ class TreasureBot(commands.Bot):
         )
 
         self.cache = {}
+        self.display_names = {}
+        self._choices = {}
+        self._choice_keys = ()
+        self._choice_forms = ()
+        self._token_index = {}
         self.last_update = None
+        self.cache_version = 0
+        self._workbook_modified = None
         self.gc = None
+        self._ttl = timedelta(hours=CACHE_REFRESH_HOURS)
+        self._refresh_task = None
+        self._last_attempt = None
+        self._retry_after = timedelta(minutes=REFRESH_RETRY_MINUTES)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=SHEET_FETCH_WORKERS)
 
     async def setup_hook(self):
         """Called once when the bot logs in."""
         # Initialize GSheets
         try:
-            self.gc = gspread.service_account(filename=JSON_KEYFILE)
+            self.gc = gspread.service_account(filename=JSON_KEYFILE, http_client=OrjsonHTTPClient)
             logger.info("Google Sheets client initialized.")
         except Exception as e:
             logger.error(f"Failed to initialize Google Sheets client: {e}")
 
-        # Start background task
-        self.background_cache_refresh.start()
+        # Serve the last snapshot right away; refresh only if it is already stale.
+        # Later refreshes are triggered by !find once the cache goes stale.
+        self._load_snapshot()
+        self.refresh_if_stale()
 
     async def on_ready(self):
         logger.info(f"Logged in as: {self.user} (ID: {self.user.id})")
@@ -81,78 +151,238 @@ class TreasureBot(commands.Bot):
 
         await self.process_commands(message)
 
-    @tasks.loop(hours=CACHE_REFRESH_HOURS)
-    async def background_cache_refresh(self):
-        """Refreshes the cache periodically using Discord.py tasks."""
+    def refresh_if_stale(self):
+        """
+        Starts a background refresh if the cache is older than the TTL and none is running.
+        After an attempt, the next one waits at least REFRESH_RETRY_MINUTES even if it failed.
+        """
+        now = datetime.now()
+        if self.last_update and now - self.last_update < self._ttl:
+            return
+        if self._last_attempt and now - self._last_attempt < self._retry_after:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._last_attempt = now
+        self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def force_refresh(self):
+        """Waits out any running refresh, then refetches every sheet. Returns True on success."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            await self._refresh_task
+        self._last_attempt = datetime.now()
+        self._refresh_task = asyncio.create_task(self._refresh(force=True))
+        return await self._refresh_task
+
+    async def _refresh(self, force=False):
+        """
+        Fetches all sheets concurrently, then merges them into the cache.
+        Unless forced, the fetch is skipped when the workbook is unchanged. Returns True on success.
+        """
         logger.info("Updating cache from Google Sheets...")
         try:
-            # Run blocking sync code in a separate thread to not freeze the bot
-            await self.loop.run_in_executor(None, self._sync_update)
-            logger.info(f"Cache updated: {len(self.cache)} items loaded.")
+            loop = asyncio.get_running_loop()
+            # Blocking gspread calls run on the thread pool to not freeze the bot
+            modified, worksheets = await loop.run_in_executor(self._pool, self._list_worksheets, force)
+            if worksheets is None:
+                # Nothing was edited since the last fetch, so the cache is still current
+                self.last_update = datetime.now()
+                logger.info("Workbook unchanged since last refresh, skipping sheet fetch.")
+            else:
+                results = await asyncio.gather(
+                    *[loop.run_in_executor(self._pool, self._fetch_sheet, sheet) for sheet in worksheets]
+                )
+                self._merge_sheets(results)
+                if all(results):
+                    self._workbook_modified = modified
+                else:
+                    # Some sheets are missing from the cache, so the next refresh must refetch
+                    self._workbook_modified = None
+                    logger.warning("Some sheets failed to load; the next refresh will fetch them again.")
+                logger.info(f"Cache updated: {len(self.cache)} items loaded.")
+
+            await loop.run_in_executor(
+                self._pool, self._save_snapshot,
+                self.cache, self.display_names, self.last_update, self._workbook_modified
+            )
         except Exception as e:
             logger.error(f"Sheet Update Failed: {e}", exc_info=True)
+            return False
+        return self._workbook_modified is not None
+
+    def _list_worksheets(self, force=False):
+        """
+        Opens the workbook and returns (modified_time, worksheets to index).
+        The worksheets are None when not forced and the workbook is unchanged since the cached fetch.
+        """
+        if not self.gc:
+            self.gc = gspread.service_account(filename=JSON_KEYFILE, http_client=OrjsonHTTPClient)
 
-    @background_cache_refresh.before_loop
-    async def before_cache_refresh(self):
-        await self.wait_until_ready()
+        wb = self.gc.open(WORKBOOK_NAME)
+        # Drive only tracks modification time per file, not per sheet
+        modified = wb.get_lastUpdateTime()
+        if not force and self.cache and modified == self._workbook_modified:
+            return modified, None
 
-    def _sync_update(self):
-        """Synchronous method to read Google Sheets."""
-        if not self.gc:
-            try:
-                self.gc = gspread.service_account(filename=JSON_KEYFILE)
-            except Exception as e:
-                logger.error(f"Failed to connect to Google Sheets: {e}")
-                return
+        return modified, [sheet for sheet in wb.worksheets() if sheet.title not in SKIP_SHEETS]
 
+    def _fetch_sheet(self, sheet):
+        """Reads one worksheet. Returns (title, rows), or None if the read failed."""
+        try:
+            return sheet.title, sheet.get_all_values()
+        except Exception as e:
+            logger.error(f"Error reading '{sheet.title}': {e}")
+            return None
+
+    def _merge_sheets(self, results):
+        """Builds the cache and fuzzy-match indexes from fetched (title, rows) pairs."""
+        temp_cache = {}
+        temp_seen = {}
+        temp_display = {}
+        sheets_scanned = 0
+
+        for result in results:
+            if not result: continue
+
+            location_name, rows = result
+            if not rows: continue
+
+            # Empty cells are dropped by filter() at C speed, before the loop body runs
+            cells = filter(None, map(str.strip, chain.from_iterable(islice(rows, 1, None))))
+            for stripped in cells:
+                key = _norm(stripped)
+                if not key: continue
+
+                locs = temp_cache.setdefault(key, [])
+                seen = temp_seen.setdefault(key, set())
+                if location_name not in seen:
+                    if not seen:
+                        # First sighting: keep the sheet's casing for display
+                        temp_display[key] = stripped
+                    seen.add(location_name)
+                    locs.append(location_name)
+
+            sheets_scanned += 1
+
+        self._set_cache(temp_cache, temp_display, datetime.now())
+        logger.info(f"Scan complete. {sheets_scanned} sheets processed.")
+
+    def _set_cache(self, cache, display_names, last_update):
+        """Swaps in a new cache along with its fuzzy-match indexes."""
+        # Fuzzy-match forms of every key, computed once per refresh instead of per query
+        choices = {k: _prep(k) for k in cache}
+
+        # Token -> keys containing it, so a query is only scored against keys it shares a token with
+        token_index = defaultdict(set)
+        for key, prepped in choices.items():
+            for token in prepped.split():
+                token_index[token].add(key)
+
+        self.cache = cache
+        self.display_names = display_names
+        self._choices = choices
+        # Parallel sequences for cdist, which scores by position
+        self._choice_keys = tuple(choices)
+        self._choice_forms = tuple(choices.values())
+        self._token_index = token_index
+        self.last_update = last_update
+        self.cache_version += 1
+
+    def fuzzy_suggestions(self, query, limit=5):
+        """Returns up to `limit` cache keys similar to a _prep()-ed query, best first."""
+        # Both sides are already _prep()-ed: the query once per call, keys once per refresh.
+        # The scorer stays token_set_ratio; plain ratio on the sorted forms is not
+        # equivalent (it rates "chair" vs "chair wooden" 59 instead of 100).
+        candidates = set().union(*(self._token_index.get(t, ()) for t in query.split()))
+
+        if len(candidates) >= MIN_FUZZY_CANDIDATES:
+            matches = process.extract(
+                query,
+                {k: self._choices[k] for k in candidates},
+                limit=limit,
+                scorer=fuzz.token_set_ratio,
+                processor=None,
+                score_cutoff=75
+            )
+            return [key for _, _, key in matches]
+
+        # Full scan: score every key in one multithreaded cdist call, then pick the
+        # top `limit` with argpartition instead of sorting the whole score row.
+        scores = process.cdist(
+            [query],
+            self._choice_forms,
+            scorer=fuzz.token_set_ratio,
+            processor=None,
+            score_cutoff=75,
+            dtype=np.uint8,
+            workers=-1
+        )[0]
+        limit = min(limit, len(scores))
+        if not limit:
+            return []
+
+        top = np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [self._choice_keys[i] for i in top if scores[i]]
+
+    def _load_snapshot(self):
+        """Restores the cache saved by the last successful refresh, if there is one."""
         try:
-            wb = self.gc.open(WORKBOOK_NAME)
-            worksheets = wb.worksheets()
-            temp_cache = {}
-            sheets_scanned = 0
-
-            for sheet in worksheets:
-                if sheet.title == "ACNH_Items":
-                    continue
-
-                try:
-                    rows = sheet.get_all_values()
-                    if not rows: continue
-
-                    location_name = sheet.title
-
-                    for row in rows[1:]:
-                        for cell in row:
-                            item_name = cell.strip()
-                            if item_name:
-                                key = item_name.lower()
-                                if key in temp_cache:
-                                    current_locations = temp_cache[key].split(", ")
-                                    if location_name not in current_locations:
-                                        temp_cache[key] += f", {location_name}"
-                                else:
-                                    temp_cache[key] = location_name
-
-                    sheets_scanned += 1
-                    # A small sleep is fine in executor, but generally gspread handles rate limits okay now
-                    # time.sleep(0.5)
-
-                except Exception as e:
-                    logger.error(f"Error reading '{sheet.title}': {e}")
-
-            self.cache = temp_cache
-            self.last_update = datetime.now()
-            logger.info(f"Scan complete. {sheets_scanned} sheets processed.")
+            with open(CACHE_FILE, 'rb') as f:
+                cache, display_names, last_update, workbook_modified = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Failed to load cache snapshot: {e}")
+            return
 
+        self._set_cache(cache, display_names, last_update)
+        self._workbook_modified = workbook_modified
+        logger.info(f"Loaded {len(cache)} items from snapshot taken at {last_update:%Y-%m-%d %H:%M:%S}.")
+
+    def _save_snapshot(self, cache, display_names, last_update, workbook_modified):
+        """Writes the cache to CACHE_FILE; the rename keeps a crash from leaving a torn file."""
+        tmp_file = f"{CACHE_FILE}.tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((cache, display_names, last_update, workbook_modified), f, protocol=5)
+            os.replace(tmp_file, CACHE_FILE)
         except Exception as e:
-            logger.error(f"Workbook fetch failed: {e}")
+            logger.error(f"Failed to save cache snapshot: {e}")
 
 
 bot = TreasureBot()
 
 
+@functools.lru_cache(maxsize=4096)
+def _resolve(query, version):
+    """
+    Looks up a _norm()-ed query in the cache, memoized per cache version.
+    Returns ("exact", locations, None), ("fuzzy", None, suggestions) or ("miss", None, None).
+    """
+    locations = bot.cache.get(query)
+    if locations is not None:
+        return "exact", locations, None
+
+    suggestions = bot.fuzzy_suggestions(_prep(query))
+    if suggestions:
+        return "fuzzy", None, tuple(suggestions)
+    return "miss", None, None
+
+
 # --- COMMANDS ---
 
+_GREEN = discord.Color.green()
+_ORANGE = discord.Color.orange()
+_GOLD = discord.Color.gold()
+_BLUE = discord.Color.blue()
+
+# Static, so built once and reused for every !help
+HELP_EMBED = discord.Embed(title="TreasureBot Help", color=_GOLD)
+HELP_EMBED.add_field(name="!find <item>", value="Search for an item location. Aliases: !locate, !where", inline=False)
+HELP_EMBED.add_field(name="!status", value="Check database status", inline=False)
+
+
 @bot.command(aliases=['locate', 'where'])
 @commands.cooldown(1, 3, commands.BucketType.user)  # 1 use every 3 seconds per user
 async def find(ctx, *, item: str = None):
@@ -160,41 +390,40 @@ async def find(ctx, *, item: str = None):
         await ctx.send("Usage: `!find <item name>`")
         return
 
+    # Serve from the current cache even if stale; the refresh runs in the background
+    bot.refresh_if_stale()
+
     if not bot.cache:
         await ctx.send("⚠️ Database is currently loading, please wait...")
         return
 
-    search_term = item.lower().strip()
+    search_term = _norm(item)
+    if len(search_term) > MAX_QUERY_LENGTH:
+        await ctx.send(f"❌ Query too long, please keep it to {MAX_QUERY_LENGTH} characters or fewer.")
+        return
+
+    kind, locations, valid_suggestions = _resolve(search_term, bot.cache_version)
 
     # 1. Exact Match
-    if search_term in bot.cache:
-        raw_locations = bot.cache[search_term]
+    if kind == "exact":
+        locations = "\n".join(loc.upper() for loc in locations)
         # Use an Embed for cleaner Discord display
         embed = discord.Embed(
-            title=f"Item Found: {search_term.upper()}",
-            description=f"**Locations:**\n{raw_locations.upper().replace(', ', '\n')}",
-            color=discord.Color.green()
+            title=f"Item Found: {bot.display_names[search_term]}",
+            description=f"**Locations:**\n{locations}",
+            color=_GREEN
         )
         await ctx.send(embed=embed)
         logger.info(f"Found {search_term} for {ctx.author}")
         return
 
     # 2. Fuzzy Match & Suggestions
-    matches = process.extract(
-        search_term,
-        bot.cache.keys(),
-        limit=5,
-        scorer=fuzz.token_set_ratio
-    )
-
-    valid_suggestions = [m[0] for m in matches if m[1] > 75]
-
-    if valid_suggestions:
-        suggestions_str = "\n".join([f"• {s}" for s in valid_suggestions])
+    if kind == "fuzzy":
+        suggestions_str = "\n".join([f"• {bot.display_names[s]}" for s in valid_suggestions])
         embed = discord.Embed(
             title="Item Not Found",
             description=f"Did you mean one of these?\n\n{suggestions_str}",
-            color=discord.Color.orange()
+            color=_ORANGE
         )
         await ctx.send(embed=embed)
     else:
@@ -205,7 +434,7 @@ async def find(ctx, *, item: str = None):
 async def status(ctx):
     if bot.last_update:
         time_str = bot.last_update.strftime("%H:%M:%S")
-        embed = discord.Embed(title="System Status", color=discord.Color.blue())
+        embed = discord.Embed(title="System Status", color=_BLUE)
         embed.add_field(name="Total Items", value=str(len(bot.cache)), inline=True)
         embed.add_field(name="Last Update", value=time_str, inline=True)
         await ctx.send(embed=embed)
@@ -215,10 +444,7 @@ async def status(ctx):
 
 @bot.command()
 async def help(ctx):
-    embed = discord.Embed(title="TreasureBot Help", color=discord.Color.gold())
-    embed.add_field(name="!find <item>", value="Search for an item location. Aliases: !locate, !where", inline=False)
-    embed.add_field(name="!status", value="Check database status", inline=False)
-    await ctx.send(embed=embed)
+    await ctx.send(embed=HELP_EMBED)
 
 
 @bot.command()
@@ -226,8 +452,10 @@ async def help(ctx):
 async def refresh(ctx):
     """Manually triggers a cache refresh (Owner only)"""
     await ctx.send("🔄 Forcing manual cache refresh...")
-    await bot.loop.run_in_executor(None, bot._sync_update)
-    await ctx.send(f"✅ Refresh complete. {len(bot.cache)} items loaded.")
+    if await bot.force_refresh():
+        await ctx.send(f"✅ Refresh complete. {len(bot.cache)} items loaded.")
+    else:
+        await ctx.send(f"⚠️ Refresh incomplete, check the logs. {len(bot.cache)} items loaded.")
 
 
 @bot.event
@@ -244,6 +472,7 @@ async def on_command_error(ctx, error):
 
 if __name__ == "__main__":
     if TOKEN:
-        bot.run(TOKEN)
+        # log_handler=None: keep discord.py from adding its own synchronous root handler
+        bot.run(TOKEN, log_handler=None)
     else:
         logger.critical("No DISCORD_TOKEN found in .env")
\ No newline at end of file